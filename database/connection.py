@@ -2,13 +2,52 @@ import os
 import streamlit as st
 import psycopg2
 from psycopg2.extras import RealDictCursor
+from psycopg2.pool import PoolError, ThreadedConnectionPool
+from contextlib import contextmanager
+import threading
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Connections per app process, shared by all sessions. Kept small, since
+# Supabase limits the connections per database and every process takes its own.
+DEFAULT_POOL_SIZE = 5
+
+# Seconds to wait for a free connection before giving up
+POOL_TIMEOUT = 300
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """
+    Thread-safe connection pool whose getconn waits for a free connection.
+    
+    ThreadedConnectionPool raises PoolError as soon as all connections are
+    in use, so a second upload (or another session's rerun) would fail while
+    an import holds the pool. Here it waits for a connection to be returned.
+    """
+    
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        super().__init__(minconn, maxconn, *args, **kwargs)
+        self._slots = threading.BoundedSemaphore(maxconn)
+    
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=POOL_TIMEOUT):
+            raise PoolError(f"no free connection in the pool after {POOL_TIMEOUT} seconds")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+    
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
 @st.cache_resource
 def init_connection():
-    """Initialize a direct PostgreSQL connection."""
+    """Initialize a pool of PostgreSQL connections shared by all sessions."""
     # Get connection parameters from environment variables
     db_host = os.environ.get("DB_HOST")
     db_port = os.environ.get("DB_PORT")
@@ -30,14 +69,35 @@ def init_connection():
     
     try:
         logger.info(f"Connecting to PostgreSQL database at {db_host}:{db_port}/{db_name}")
-        conn = psycopg2.connect(
+        pool_size = max(1, int(os.environ.get("DB_POOL_SIZE", DEFAULT_POOL_SIZE)))
+        pool = BlockingConnectionPool(
+            minconn=min(2, pool_size),
+            maxconn=pool_size,
             host=db_host,
             port=db_port,
             dbname=db_name,
             user=db_user,
             password=db_password
         )
-        return conn
+        return pool
     except Exception as e:
         logger.error(f"Failed to connect to PostgreSQL: {e}")
-        raise
\ No newline at end of file
+        raise
+
+
+@contextmanager
+def get_conn(pool):
+    """
+    Borrow a connection from the pool, returning it when done.
+    
+    Args:
+        pool: Connection pool from init_connection()
+    
+    Yields:
+        PostgreSQL connection
+    """
+    conn = pool.getconn()
+    try:
+        yield conn
+    finally:
+        pool.putconn(conn, close=bool(conn.closed))
\ No newline at end of file
@@ -1,251 +1,225 @@
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 import psycopg2
+import streamlit as st
 from psycopg2.extras import RealDictCursor
 import logging
 import json
+import csv
+import io
+
+from utils.data_processing import ScrapeRecord
 
 logger = logging.getLogger(__name__)
 
+# NULL marker for COPY, so empty strings stay empty strings
+COPY_NULL = r"\N"
+
+# The column set is fixed, so the batch insert SQL is built once at import
+_COLUMN_LIST = ', '.join(ScrapeRecord._fields)
+
+# Staging table with the same column types as scrape_data, but no constraints or defaults
+_CREATE_STAGE_SQL = f"""
+CREATE TEMP TABLE stage_scrape_data ON COMMIT DROP AS
+SELECT {_COLUMN_LIST} FROM scrape_data
+WITH NO DATA
+"""
+
+_COPY_STAGE_SQL = f"COPY stage_scrape_data ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+_COPY_DATA_SQL = f"COPY scrape_data ({_COLUMN_LIST}) FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')"
+
+# A staged row is a duplicate if a row for the same campaign, scrape type,
+# keyword and day already has its product_id, or its title and link
+_INSERT_NEW_SQL = f"""
+INSERT INTO scrape_data ({_COLUMN_LIST})
+SELECT {_COLUMN_LIST}
+FROM stage_scrape_data s
+WHERE NOT EXISTS (
+    SELECT 1
+    FROM scrape_data d
+    WHERE d.campaign_id = s.campaign_id
+    AND d.scrape_type_id = s.scrape_type_id
+    AND d.keyword = s.keyword
+    -- Same day as a range, so the lookup index on scrape_date is usable
+    AND d.scrape_date >= s.scrape_date::date
+    AND d.scrape_date < s.scrape_date::date + 1
+    AND (
+        d.product_id = s.product_id
+        OR (d.title = s.title AND d.link = s.link)
+    )
+)
+"""
 
-def get_campaigns(conn) -> List[Dict[str, Any]]:
+
+@st.cache_data(ttl=300, show_spinner=False)
+def get_campaigns(_conn) -> List[Dict[str, Any]]:
     """
     Get all campaigns with client information using direct SQL query.
     
+    Results are cached for 5 minutes across Streamlit reruns. Errors are
+    raised rather than cached, so the next rerun queries again.
+    
     Args:
-        conn: PostgreSQL connection
+        _conn: PostgreSQL connection (not part of the cache key)
     
     Returns:
         List of campaign dictionaries, each containing client info
     """
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            # First test if we can access the campaigns table
-            cur.execute("SELECT count(*) FROM campaigns")
-            count = cur.fetchone()['count']
-            logger.info(f"Found {count} campaigns in database")
-            
-            # Now get campaigns with client info
-            query = """
-            SELECT 
-                c.campaign_id, 
-                c.client_id, 
-                c.domain_name, 
-                c.brand_name,
-                json_build_object(
-                    'client_id', cl.client_id,
-                    'name', cl.name,
-                    'surname', cl.surname,
-                    'email', cl.email
-                ) as clients
-            FROM campaigns c
-            JOIN clients cl ON c.client_id = cl.client_id
-            ORDER BY c.domain_name
-            """
-            cur.execute(query)
-            campaigns = cur.fetchall()
-            
-            # Convert RealDictRow objects to regular dictionaries
-            result = [dict(campaign) for campaign in campaigns]
-            logger.info(f"Retrieved {len(result)} campaigns with client info")
-            return result
-    except Exception as e:
-        logger.error(f"Error getting campaigns: {e}")
-        return []
+    with _conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Get campaigns with client info
+        query = """
+        SELECT 
+            c.campaign_id, 
+            c.client_id, 
+            c.domain_name, 
+            c.brand_name,
+            json_build_object(
+                'client_id', cl.client_id,
+                'name', cl.name,
+                'surname', cl.surname,
+                'email', cl.email
+            ) as clients
+        FROM campaigns c
+        JOIN clients cl ON c.client_id = cl.client_id
+        ORDER BY c.domain_name
+        """
+        cur.execute(query)
+        campaigns = cur.fetchall()
+        
+        # Convert RealDictRow objects to regular dictionaries
+        result = [dict(campaign) for campaign in campaigns]
+        logger.info(f"Retrieved {len(result)} campaigns with client info")
+        return result
 
 
-def get_scrape_types(conn) -> List[Dict[str, Any]]:
+@st.cache_data(ttl=300, show_spinner=False)
+def get_scrape_types(_conn) -> List[Dict[str, Any]]:
     """
     Get all scrape types from the database.
     
+    Results are cached for 5 minutes across Streamlit reruns. Errors are
+    raised rather than cached, so the next rerun queries again.
+    
     Args:
-        conn: PostgreSQL connection
+        _conn: PostgreSQL connection (not part of the cache key)
     
     Returns:
         List of scrape type dictionaries
     """
-    try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
-            cur.execute("SELECT * FROM scrape_types ORDER BY name")
-            scrape_types = cur.fetchall()
-            return [dict(st) for st in scrape_types]
-    except Exception as e:
-        logger.error(f"Error getting scrape types: {e}")
-        return []
+    with _conn.cursor(cursor_factory=RealDictCursor) as cur:
+        cur.execute("SELECT * FROM scrape_types ORDER BY name")
+        scrape_types = cur.fetchall()
+        return [dict(scrape_type) for scrape_type in scrape_types]
+
+
+def _records_to_csv(records: List[ScrapeRecord]) -> io.StringIO:
+    """
+    Serialize records as CSV rows for COPY.
+    
+    Args:
+        records: Scrape data records; None fields are written as NULL
+    
+    Returns:
+        Buffer positioned at the start of the CSV data
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for record in records:
+        writer.writerow([COPY_NULL if value is None else value for value in record])
+    buf.seek(0)
+    return buf
 
 
-def batch_insert_scrape_data(conn, scrape_data_batch: List[Dict[str, Any]], force_upload: bool = False) -> List[Dict[str, Any]]:
+def batch_insert_scrape_data(conn, scrape_data_batch: List[ScrapeRecord], force_upload: bool = False,
+                             commit: bool = True, fast_commit: bool = True) -> int:
     """
     Insert multiple scrape data records into the database as a batch,
-    with efficient duplicate checking.
+    with duplicate checking done by the database.
+    
+    The batch is COPYed into a temporary staging table and moved into
+    scrape_data with a single INSERT ... SELECT. A record is a duplicate if
+    a row for the same campaign, scrape type, scrape day and keyword already
+    has its product_id, or its title and link. Without duplicate checking,
+    the batch is COPYed straight into scrape_data.
+    
+    Args:
+        conn: PostgreSQL connection
+        scrape_data_batch: Records to insert
+        force_upload: Whether to insert all records without checking for duplicates
+        commit: Whether to commit after the batch. If False, the batch runs in a
+            savepoint of the caller's transaction, so a failed batch is rolled back
+            without losing earlier batches, and the caller commits. If it fails
+            before the savepoint exists, the caller's transaction is left aborted.
+        fast_commit: Whether to turn off synchronous_commit for the transaction.
+            COMMIT then returns without waiting for the WAL flush, so a database
+            crash can lose the last few hundred milliseconds of committed batches.
+            That is acceptable here because an import can be re-run from its Excel
+            file, and the duplicate check skips rows that did make it in.
+    
+    Returns:
+        Number of records inserted
     """
     if not scrape_data_batch:
-        return []
+        return 0
     
+    savepoint = False
     try:
-        with conn.cursor(cursor_factory=RealDictCursor) as cur:
+        # Plain tuple cursor: no per-row dict is needed for the probe
+        with conn.cursor() as cur:
+            # Before the savepoint, so rolling back a failed batch keeps the setting
+            if fast_commit:
+                cur.execute("SET LOCAL synchronous_commit = off")
+            
+            if not commit:
+                cur.execute("SAVEPOINT batch_insert")
+                savepoint = True
+            
             # Simple check to see if the table is empty for this campaign
             if not force_upload:
-                cur.execute("SELECT COUNT(*) FROM scrape_data WHERE campaign_id = %s", (scrape_data_batch[0]['campaign_id'],))
-                count = cur.fetchone()['count']
+                cur.execute("SELECT 1 FROM scrape_data WHERE campaign_id = %s LIMIT 1", (scrape_data_batch[0].campaign_id,))
                 
                 # If the table is empty for this campaign, we don't need duplicate checking
-                if count == 0:
-                    logger.info(f"No existing records for campaign {scrape_data_batch[0]['campaign_id']} - skipping duplicate check")
+                if cur.fetchone() is None:
+                    logger.debug(f"No existing records for campaign {scrape_data_batch[0].campaign_id} - skipping duplicate check")
                     force_upload = True
             
-            # If force upload is enabled, skip duplicate checking
+            csv_data = _records_to_csv(scrape_data_batch)
+            
             if force_upload:
-                # Proceed directly to insertion
-                records_to_insert = scrape_data_batch
-                skipped_count = 0
+                # Proceed directly to insertion, COPYing straight into scrape_data
+                cur.copy_expert(_COPY_DATA_SQL, csv_data)
+                inserted_count = len(scrape_data_batch)
             else:
-                # Get unique campaign IDs, scrape type IDs, and keywords from the batch
-                campaign_ids = set(r['campaign_id'] for r in scrape_data_batch)
-                scrape_type_ids = set(r['scrape_type_id'] for r in scrape_data_batch)
-                keywords = set(r['keyword'] for r in scrape_data_batch)
-                
-                # Extract unique dates (just the date part) and convert to proper date format
-                # This must be fixed to avoid the type cast error
-                dates_list = []
-                for record in scrape_data_batch:
-                    date_str = record.get('scrape_date', '')
-                    if isinstance(date_str, str):
-                        import re
-                        date_match = re.match(r'(\d{4}-\d{2}-\d{2})', date_str)
-                        if date_match:
-                            dates_list.append(date_match.group(1))
-                
-                # Build a query to get all potentially matching records in one go
-                # Modified to use a date-safe comparison
-                fetch_sql = """
-                SELECT 
-                    id, 
-                    campaign_id, 
-                    scrape_type_id, 
-                    DATE(scrape_date) as scrape_date, 
-                    keyword, 
-                    product_id, 
-                    title, 
-                    link
-                FROM scrape_data 
-                WHERE campaign_id = ANY(%s)
-                AND scrape_type_id = ANY(%s)
-                AND keyword = ANY(%s)
-                """
-                
-                query_params = [
-                    list(campaign_ids), 
-                    list(scrape_type_ids),
-                    list(keywords)
-                ]
-                
-                # Only add date filtering if we have dates to filter by
-                if dates_list:
-                    date_placeholders = []
-                    for i, date_str in enumerate(dates_list):
-                        date_placeholders.append(f"%s::date")
-                        query_params.append(date_str)
-                    
-                    fetch_sql += f" AND DATE(scrape_date) IN ({', '.join(date_placeholders)})"
-                
-                # Execute the query
-                cur.execute(fetch_sql, query_params)
-                
-                existing_records = cur.fetchall()
-                
-                # Create lookup sets for quick duplicate checking
-                product_id_set = set()
-                title_link_set = set()
-                
-                for rec in existing_records:
-                    # Create a composite key for each existing record
-                    campaign_date_kw_prod = (
-                        rec['campaign_id'], 
-                        rec['scrape_type_id'],
-                        str(rec['scrape_date']), 
-                        rec['keyword'], 
-                        rec['product_id']
-                    )
-                    product_id_set.add(campaign_date_kw_prod)
-                    
-                    # Also check title+link combination
-                    campaign_date_kw_title_link = (
-                        rec['campaign_id'], 
-                        rec['scrape_type_id'],
-                        str(rec['scrape_date']), 
-                        rec['keyword'], 
-                        rec['title'], 
-                        rec.get('link', '')
-                    )
-                    title_link_set.add(campaign_date_kw_title_link)
-                
-                # Filter out duplicates
-                records_to_insert = []
-                skipped_count = 0
-                
-                for record in scrape_data_batch:
-                    # Extract date part for comparison
-                    date_str = record.get('scrape_date', '')
-                    if isinstance(date_str, str):
-                        import re
-                        date_match = re.match(r'(\d{4}-\d{2}-\d{2})', date_str)
-                        date_part = date_match.group(1) if date_match else date_str
-                    else:
-                        date_part = str(date_str)
-                    
-                    # Check if it's a duplicate by product_id
-                    product_key = (
-                        record['campaign_id'], 
-                        record['scrape_type_id'],
-                        date_part, 
-                        record['keyword'], 
-                        record['product_id']
-                    )
-                    
-                    # Check if it's a duplicate by title+link
-                    title_link_key = (
-                        record['campaign_id'], 
-                        record['scrape_type_id'],
-                        date_part, 
-                        record['keyword'], 
-                        record['title'], 
-                        record.get('link', '')
-                    )
-                    
-                    # If neither key exists, it's not a duplicate
-                    if product_key not in product_id_set and title_link_key not in title_link_set:
-                        records_to_insert.append(record)
-                    else:
-                        skipped_count += 1
-            
-            # Now insert all non-duplicate records
-            inserted_ids = []
-            for record in records_to_insert:
-                columns = list(record.keys())
-                placeholders = [f"%({col})s" for col in columns]
-                
-                sql = f"""
-                INSERT INTO scrape_data ({', '.join(columns)})
-                VALUES ({', '.join(placeholders)})
-                RETURNING id
-                """
-                
-                # Execute for a single record
-                cur.execute(sql, record)
-                result = cur.fetchone()
-                if result and 'id' in result:
-                    inserted_ids.append({"id": result["id"]})
+                # Stage the batch, then only insert the rows that don't match an existing record
+                cur.execute(_CREATE_STAGE_SQL)
+                cur.copy_expert(_COPY_STAGE_SQL, csv_data)
+                cur.execute(_INSERT_NEW_SQL)
+                inserted_count = cur.rowcount
+                cur.execute("DROP TABLE stage_scrape_data")
             
-            conn.commit()
+            if commit:
+                conn.commit()
+            else:
+                cur.execute("RELEASE SAVEPOINT batch_insert")
             
             if force_upload:
-                logger.info(f"Force uploaded {len(inserted_ids)} records (bypassed duplicate check)")
+                logger.debug(f"Force uploaded {inserted_count} records (bypassed duplicate check)")
             else:
-                logger.info(f"Inserted {len(inserted_ids)} new records, skipped {skipped_count} existing records")
+                skipped_count = len(scrape_data_batch) - inserted_count
+                logger.debug(f"Inserted {inserted_count} new records, skipped {skipped_count} existing records")
                 
-            return inserted_ids
+            return inserted_count
     except Exception as e:
-        conn.rollback()
         logger.error(f"Error batch inserting scrape data: {e}")
+        try:
+            if commit:
+                conn.rollback()
+            elif savepoint:
+                # Undo just this batch, keeping the caller's transaction usable
+                with conn.cursor() as cur:
+                    cur.execute("ROLLBACK TO SAVEPOINT batch_insert")
+        except Exception as rollback_error:
+            logger.error(f"Error rolling back failed batch: {rollback_error}")
+        # Re-raise the original error, not one from the rollback
         raise
\ No newline at end of file
@@ -43,6 +43,9 @@ CREATE INDEX IF NOT EXISTS idx_scrape_data_scrape_type ON scrape_data(scrape_typ
 CREATE INDEX IF NOT EXISTS idx_scrape_data_keyword ON scrape_data(keyword);
 CREATE INDEX IF NOT EXISTS idx_scrape_data_date ON scrape_data(scrape_date);
 
+-- Composite index for the duplicate check on insert
+CREATE INDEX IF NOT EXISTS idx_scrape_data_lookup ON scrape_data(campaign_id, scrape_type_id, keyword, scrape_date);
+
 -- Create function to get campaigns with client info
 CREATE OR REPLACE FUNCTION get_campaigns_with_clients()
 RETURNS TABLE (
@@ -1,30 +1,38 @@
 import streamlit as st
 import pandas as pd
 import os
+import hashlib
 import logging
+import logging.handlers
 from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from typing import List, Tuple
 from dotenv import load_dotenv
+from psycopg2.extensions import TRANSACTION_STATUS_INERROR
 
 # Load environment variables
 
 #variablshit
 load_dotenv()
 
-# Configure logging
+# Configure logging (buffered, flushed every 1024 records or on an error)
 logging_level = os.environ.get("LOG_LEVEL", "INFO")
+log_stream_handler = logging.StreamHandler()
+log_stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
 logging.basicConfig(
     level=getattr(logging, logging_level),
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     handlers=[
-        logging.StreamHandler()
+        logging.handlers.MemoryHandler(1024, flushLevel=logging.ERROR, target=log_stream_handler)
     ]
 )
 logger = logging.getLogger(__name__)
 
 # Import components
-from database.connection import init_connection
+from database.connection import init_connection, get_conn
 from database.models import get_campaigns, get_scrape_types, batch_insert_scrape_data
-from utils.data_processing import detect_and_transform_data
+from utils.data_processing import ScrapeRecord, detect_and_transform_data, fill_generated_fields, is_used_column, parse_date_column, string_column_dtypes
 from ui.components import (
     render_header,
     render_campaign_selection,
@@ -34,122 +42,308 @@ from ui.components import (
 )
 
 
-def process_excel_file(file_path: str, campaign_id: int, scrape_type_id: int, force_upload: bool = False) -> dict:
+# Native (Rust) Excel reader, used when installed
+try:
+    import python_calamine  # noqa: F401
+    HAS_CALAMINE = True
+except ImportError:
+    HAS_CALAMINE = False
+
+# Batch size for database inserts
+BATCH_SIZE = 100
+
+# Non-data sheets to skip, by scrape type ID
+DEFAULT_SKIP_SHEETS = frozenset({"Keywords", "Aggregated Results", "Error Logs"})
+SKIP_SHEETS_BY_TYPE = {
+    1: DEFAULT_SKIP_SHEETS,  # Products Scrape
+    2: DEFAULT_SKIP_SHEETS | {"Output"},  # Shopping Tab Scrape
+}
+
+
+def pick_excel_engine(file_path: str) -> str:
     """
-    Process an Excel file and insert the data into the database using batch processing.
+    Pick the pandas engine for reading an Excel file.
     
     Args:
         file_path: Path to the Excel file
+        
+    Returns:
+        'calamine' if installed (reads both .xlsx and .xls), otherwise
+        'xlrd' for .xls and 'openpyxl' for everything else
+    """
+    if HAS_CALAMINE:
+        return 'calamine'
+    if file_path.lower().endswith('.xls'):
+        return 'xlrd'
+    return 'openpyxl'
+
+
+def load_sheet_records(xl: pd.ExcelFile, xl_lock: threading.Lock, sheet_name: str, campaign_id: int, scrape_type_id: int) -> Tuple[List[ScrapeRecord], List[str]]:
+    """
+    Read a single sheet (keyword) of an Excel file and transform it into records.
+    
+    Args:
+        xl: Opened Excel file shared by all sheets
+        xl_lock: Lock serializing reads from the shared Excel file
+        sheet_name: Name of the sheet to process
         campaign_id: ID of the campaign
         scrape_type_id: ID of the scrape type
-        force_upload: Whether to force upload without checking for duplicates
         
     Returns:
-        Statistics about the processing
+        Records of the sheet, and errors found while reading it
     """
-    logger.info(f"Processing Excel file for campaign ID: {campaign_id}, scrape type ID: {scrape_type_id}, force upload: {force_upload}")
+    try:
+        logger.info(f"Processing sheet: {sheet_name}")
+        
+        # Read the header first: the text columns depend on the products in it,
+        # and it is what gets reported if the sheet's format isn't recognized
+        with xl_lock:
+            header = pd.read_excel(xl, sheet_name=sheet_name, nrows=0).columns
+        
+        if len(header) and not any(is_used_column(col) for col in header):
+            logger.warning(f"Could not determine data format for sheet {sheet_name}. Columns: {header.tolist()}")
+            logger.warning(f"No valid records found in sheet: {sheet_name}")
+            return [], [f"No valid records found in sheet: {sheet_name}"]
+        
+        # Read sheet data from the already opened workbook (not thread-safe),
+        # skipping columns that no transform uses and reading text columns as strings
+        with xl_lock:
+            df = pd.read_excel(xl, sheet_name=sheet_name, usecols=is_used_column, dtype=string_column_dtypes(header))
+        
+        if df.empty:
+            logger.warning(f"No data in sheet: {sheet_name}")
+            return [], [f"No data in sheet: {sheet_name}"]
+        
+        # Determine the date for this sheet, parsing the Date column once for all rows
+        sheet_date = None
+        if 'Date' in df.columns:
+            df['Date'] = parse_date_column(df['Date'])
+            first_date_idx = df['Date'].first_valid_index()
+            if first_date_idx is not None:
+                sheet_date = df.at[first_date_idx, 'Date']
+        
+        # Left unset, so a cached parse doesn't pin the date of its first run
+        if sheet_date is None:
+            logger.info(f"No valid date found in sheet, using current date")
+        
+        # Transform data based on its format (the date and generated product IDs
+        # are filled in at insert time, see fill_generated_fields). The records are
+        # kept as a list, since they are what transform_excel_file caches.
+        records = list(detect_and_transform_data(
+            df,
+            sheet_name,
+            sheet_date,
+            campaign_id,
+            scrape_type_id,
+            sheet_columns=header.tolist(),
+            generate_ids=False
+        ))
+        
+        if not records:
+            logger.warning(f"No valid records found in sheet: {sheet_name}")
+            return [], [f"No valid records found in sheet: {sheet_name}"]
+        
+        return records, []
+        
+    except Exception as e:
+        error_msg = f"Error processing sheet {sheet_name}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        return [], [error_msg]
+
+
+@st.cache_data(ttl=3600, show_spinner=False, max_entries=4)
+def transform_excel_file(file_digest: str, campaign_id: int, scrape_type_id: int, _file_path: str) -> List[Tuple[str, List[ScrapeRecord], List[str]]]:
+    """
+    Read and transform the data sheets of an Excel file, caching the result.
     
-    # Get database connection
-    conn = init_connection()
+    Only parsing is cached, so processing the same file again skips straight
+    to the database inserts. Records are cached without the fields that must
+    differ between runs: rows with no valid date have no scrape date, and
+    shopping grid products have no product ID (see fill_generated_fields).
     
-    # Stats to return
+    The records of every sheet are held at once, so memory scales with the
+    size of the workbook, times the number of cached workbooks (at most 4,
+    each kept for an hour).
+    
+    Args:
+        file_digest: SHA-256 of the file contents
+        campaign_id: ID of the campaign
+        scrape_type_id: ID of the scrape type
+        _file_path: Path to the Excel file (not part of the cache key)
+        
+    Returns:
+        (sheet name, records, errors) of each data sheet, in workbook order
+    """
+    # Load Excel file once, with the native calamine reader if available
+    xl = pd.ExcelFile(_file_path, engine=pick_excel_engine(_file_path))
+    xl_lock = threading.Lock()
+    
+    # Get all sheet names
+    all_sheets = xl.sheet_names
+    
+    # Determine which sheets to process based on scrape type
+    skip_sheets = SKIP_SHEETS_BY_TYPE.get(scrape_type_id, DEFAULT_SKIP_SHEETS)
+    logger.info(f"Skipping non-data sheets: {', '.join(sorted(skip_sheets))}")
+    sheets_to_process = [sheet for sheet in all_sheets if sheet not in skip_sheets]
+    
+    logger.info(f"Found {len(sheets_to_process)} sheets to process: {', '.join(sheets_to_process)}")
+    
+    # Transform sheets concurrently; only the workbook reads are serialized
+    max_workers = max(1, min(os.cpu_count() or 1, len(sheets_to_process)))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(load_sheet_records, xl, xl_lock, sheet_name, campaign_id, scrape_type_id)
+            for sheet_name in sheets_to_process
+        ]
+        return [
+            (sheet_name, *future.result())
+            for sheet_name, future in zip(sheets_to_process, futures)
+        ]
+
+
+def insert_sheet_records(pool, sheet_name: str, records: List[ScrapeRecord], scrape_date: datetime, force_upload: bool = False) -> dict:
+    """
+    Insert the records of a single sheet (keyword) on its own pooled connection.
+    
+    Args:
+        pool: Connection pool to borrow a connection from
+        sheet_name: Name of the sheet the records came from
+        records: Records of the sheet, as cached by transform_excel_file
+        scrape_date: Date for records without one
+        force_upload: Whether to force upload without checking for duplicates
+        
+    Returns:
+        Statistics about the processing of this sheet
+    """
     stats = {
         "keywords_processed": 0,
         "rows_processed": 0,
         "errors": []
     }
     
-    # Batch size for database inserts
-    BATCH_SIZE = 100
-    
     try:
-        # Load Excel file
-        xl = pd.ExcelFile(file_path)
-        
-        # Get all sheet names
-        all_sheets = xl.sheet_names
-        
-        # Determine which sheets to process based on scrape type
-        sheets_to_process = []
-        
-        if scrape_type_id == 1:  # Products Scrape
-            logger.info("Processing as Products Scrape - skipping non-data sheets")
-            # Skip common non-data sheets
-            skip_sheets = ["Keywords", "Aggregated Results", "Error Logs"]
-            sheets_to_process = [sheet for sheet in all_sheets if sheet not in skip_sheets]
-        elif scrape_type_id == 2:  # Shopping Tab Scrape
-            logger.info("Processing as Shopping Tab Scrape - skipping non-data sheets")
-            # Skip common non-data sheets
-            skip_sheets = ["Keywords", "Aggregated Results", "Error Logs", "Output"]
-            sheets_to_process = [sheet for sheet in all_sheets if sheet not in skip_sheets]
-        else:
-            # For other scrape types, use all sheets except common ones to skip
-            skip_sheets = ["Keywords", "Aggregated Results", "Error Logs"]
-            sheets_to_process = [sheet for sheet in all_sheets if sheet not in skip_sheets]
-        
-        logger.info(f"Found {len(sheets_to_process)} sheets to process: {', '.join(sheets_to_process)}")
-        
-        # Process each sheet (keyword)
-        for sheet_name in sheets_to_process:
+        # Insert records in batches, committing the whole sheet at once
+        total_inserted = 0
+        aborted = False
+        with get_conn(pool) as conn:
             try:
-                logger.info(f"Processing sheet: {sheet_name}")
-                
-                # Read sheet data
-                df = pd.read_excel(file_path, sheet_name=sheet_name)
-                
-                if df.empty:
-                    logger.warning(f"No data in sheet: {sheet_name}")
-                    stats["errors"].append(f"No data in sheet: {sheet_name}")
-                    continue
-                
-                # Determine the date for this sheet
-                sheet_date = None
-                if 'Date' in df.columns:
-                    for _, row in df.iterrows():
-                        if not pd.isna(row['Date']):
-                            sheet_date = row['Date']
-                            break
-                
-                if not sheet_date:
-                    sheet_date = datetime.now()
-                    logger.info(f"No valid date found in sheet, using current date")
-                
-                # Transform data based on its format
-                transformed_records = detect_and_transform_data(
-                    df,
-                    sheet_name,
-                    sheet_date,
-                    campaign_id,
-                    scrape_type_id
-                )
-                
-                if not transformed_records:
-                    logger.warning(f"No valid records found in sheet: {sheet_name}")
-                    stats["errors"].append(f"No valid records found in sheet: {sheet_name}")
-                    continue
-                
-                # Insert records in batches
-                total_inserted = 0
-                for i in range(0, len(transformed_records), BATCH_SIZE):
-                    batch = transformed_records[i:i+BATCH_SIZE]
+                # Take batches straight off the cached list, without slicing copies of it
+                remaining = iter(records)
+                while True:
+                    batch = list(islice(remaining, BATCH_SIZE))
+                    if not batch:
+                        break
+                    batch = fill_generated_fields(batch, scrape_date)
+                    
                     try:
                         # Pass the force_upload parameter to the batch insert function
-                        batch_insert_scrape_data(conn, batch, force_upload)
+                        batch_insert_scrape_data(conn, batch, force_upload, commit=False)
                         total_inserted += len(batch)
                         logger.debug(f"Inserted batch of {len(batch)} records for sheet: {sheet_name}")
                     except Exception as e:
                         error_msg = f"Error inserting batch for sheet {sheet_name}: {str(e)}"
                         logger.error(error_msg, exc_info=True)
                         stats["errors"].append(error_msg)
+                        
+                        # A batch that failed before its savepoint leaves the sheet's
+                        # transaction unusable, so every later batch would fail too
+                        if conn.closed or conn.info.transaction_status == TRANSACTION_STATUS_INERROR:
+                            aborted = True
+                            break
                 
-                logger.info(f"Processed {total_inserted} rows from sheet: {sheet_name}")
-                stats["rows_processed"] += total_inserted
-                stats["keywords_processed"] += 1
+                if aborted:
+                    if not conn.closed:
+                        conn.rollback()
+                    logger.warning(f"Rolled back all records of sheet: {sheet_name}")
+                    stats["errors"].append(f"Rolled back all records of sheet: {sheet_name}")
+                    return stats
                 
-            except Exception as e:
-                error_msg = f"Error processing sheet {sheet_name}: {str(e)}"
-                logger.error(error_msg, exc_info=True)
-                stats["errors"].append(error_msg)
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+        
+        logger.info(f"Processed {total_inserted} rows from sheet: {sheet_name}")
+        stats["rows_processed"] += total_inserted
+        stats["keywords_processed"] += 1
+        
+    except Exception as e:
+        error_msg = f"Error processing sheet {sheet_name}: {str(e)}"
+        logger.error(error_msg, exc_info=True)
+        stats["errors"].append(error_msg)
+    
+    return stats
+
+
+def file_sha256(file_path: str) -> str:
+    """
+    Hash a file's contents, reading it in 1 MB chunks.
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Hex SHA-256 digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def process_excel_file(file_path: str, campaign_id: int, scrape_type_id: int, force_upload: bool = False) -> dict:
+    """
+    Process an Excel file and insert the data into the database using batch processing.
+    
+    Parsing is cached by file contents (see transform_excel_file); the inserts
+    always run. Sheets are inserted concurrently, each on its own pooled connection.
+    
+    Args:
+        file_path: Path to the Excel file
+        campaign_id: ID of the campaign
+        scrape_type_id: ID of the scrape type
+        force_upload: Whether to force upload without checking for duplicates
+        
+    Returns:
+        Statistics about the processing
+    """
+    logger.info(f"Processing Excel file for campaign ID: {campaign_id}, scrape type ID: {scrape_type_id}, force upload: {force_upload}")
+    
+    # Get database connection pool
+    pool = init_connection()
+    
+    # Stats to return
+    stats = {
+        "keywords_processed": 0,
+        "rows_processed": 0,
+        "errors": []
+    }
+    
+    try:
+        sheets = transform_excel_file(file_sha256(file_path), campaign_id, scrape_type_id, file_path)
+        # Date of this run, for sheets without a valid date
+        scrape_date = datetime.now()
+        
+        # Insert each sheet (keyword) with records, keeping one connection free for the UI,
+        # with no more threads than there are sheets
+        max_workers = max(1, min(pool.maxconn - 1, len(sheets)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(insert_sheet_records, pool, sheet_name, records, scrape_date, force_upload) if records else None
+                for sheet_name, records, _ in sheets
+            ]
+            
+            # Collect in sheet order so errors are reported in a stable order
+            for (_, _, sheet_errors), future in zip(sheets, futures):
+                stats["errors"].extend(sheet_errors)
+                if future is None:
+                    continue
+                sheet_stats = future.result()
+                stats["keywords_processed"] += sheet_stats["keywords_processed"]
+                stats["rows_processed"] += sheet_stats["rows_processed"]
+                stats["errors"].extend(sheet_stats["errors"])
         
         return stats
         
@@ -171,20 +365,31 @@ def main():
     # Render header
     render_header()
     
-    # Initialize PostgreSQL connection
+    # Initialize PostgreSQL connection pool
     try:
-        conn = init_connection()
+        pool = init_connection()
         st.success("Connected to PostgreSQL database!")
     except Exception as e:
         st.error(f"Failed to connect to database: {e}")
         st.stop()
     
     try:
-        # Get campaigns
-        campaigns = get_campaigns(conn)
-        
-        # Get scrape types
-        scrape_types = get_scrape_types(conn)
+        with get_conn(pool) as conn:
+            # Get campaigns (a failed query isn't cached, so the next rerun retries)
+            try:
+                campaigns = get_campaigns(conn)
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error getting campaigns: {e}")
+                campaigns = []
+            
+            # Get scrape types
+            try:
+                scrape_types = get_scrape_types(conn)
+            except Exception as e:
+                conn.rollback()
+                logger.error(f"Error getting scrape types: {e}")
+                scrape_types = []
         
         # Campaign selection
         selected_campaign = render_campaign_selection(campaigns)
@@ -1,7 +1,8 @@
 import streamlit as st
 import os
+import shutil
 import tempfile
-from typing import List, Dict, Any, Optional, Callable
+from typing import List, Dict, Any, Optional, Callable, Tuple
 
 
 def render_header():
@@ -10,6 +11,16 @@ def render_header():
     st.write("Upload Excel files from shopping scraper and import them into the database.")
 
 
+def _campaign_label(campaign: Dict[str, Any]) -> str:
+    """Display name of a campaign in the selectbox."""
+    return f"{campaign['domain_name']} (ID: {campaign['campaign_id']})"
+
+
+def _scrape_type_label(scrape_type: Dict[str, Any]) -> str:
+    """Display name of a scrape type in the selectbox."""
+    return scrape_type['name']
+
+
 def render_campaign_selection(campaigns: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
     """
     Render the campaign selection component.
@@ -26,19 +37,13 @@ def render_campaign_selection(campaigns: List[Dict[str, Any]]) -> Optional[Dict[
         st.warning("No campaigns found in the database.")
         return None
     
-    # Create display names for each campaign
-    campaign_options = [f"{c['domain_name']} (ID: {c['campaign_id']})" for c in campaigns]
-    
-    # Create selectbox
-    selected_idx = st.selectbox(
+    # Create selectbox, with the display names made by format_func
+    selected_campaign = st.selectbox(
         "Select campaign:",
-        range(len(campaign_options)),
-        format_func=lambda i: campaign_options[i]
+        campaigns,
+        format_func=_campaign_label
     )
     
-    # Get the selected campaign
-    selected_campaign = campaigns[selected_idx]
-    
     # Display campaign info
     st.write(f"Selected Campaign: **{selected_campaign['domain_name']}**")
     
@@ -71,22 +76,63 @@ def render_scrape_type_selection(scrape_types: List[Dict[str, Any]]) -> Optional
         st.warning("No scrape types found in the database.")
         return None
     
-    # Create display names
-    scrape_type_options = [t['name'] for t in scrape_types]
-    
-    # Create selectbox
-    selected_idx = st.selectbox(
+    # Create selectbox, with the display names made by format_func
+    selected_scrape_type = st.selectbox(
         "Select scrape type:",
-        range(len(scrape_type_options)),
-        format_func=lambda i: scrape_type_options[i]
+        scrape_types,
+        format_func=_scrape_type_label
     )
     
-    # Get the selected scrape type
-    selected_scrape_type = scrape_types[selected_idx]
-    
     return selected_scrape_type
 
 
+def _process_upload(uploaded_file, process_callback: Callable[[str, int, int, bool], Dict[str, Any]],
+                    campaign_id: int, scrape_type_id: int, force_upload: bool
+                    ) -> Tuple[Dict[str, Any], Optional[str]]:
+    """
+    Save the uploaded file to a temporary file and process it.
+    
+    Args:
+        uploaded_file: The uploaded file
+        process_callback: Function to call to process the file
+        campaign_id: ID of the selected campaign
+        scrape_type_id: ID of the selected scrape type
+        force_upload: Whether to force upload without checking for duplicates
+        
+    Returns:
+        Statistics about the processing, and a warning if the temporary file could not be removed
+    """
+    # Save uploaded file to a temporary file
+    # (keeping the extension, which decides how the file is read)
+    suffix = os.path.splitext(uploaded_file.name)[1] or '.xlsx'
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        # Copy in 1 MB chunks, rewinding first so a re-click re-reads the whole file
+        uploaded_file.seek(0)
+        shutil.copyfileobj(uploaded_file, tmp_file, length=1024 * 1024)
+        temp_path = tmp_file.name
+    
+    try:
+        # Process the file - passing force_upload parameter
+        stats = process_callback(temp_path, campaign_id, scrape_type_id, force_upload)
+    except Exception:
+        # Clean up temp file
+        try:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+        except Exception:
+            pass
+        raise
+    
+    # Clean up temp file
+    cleanup_warning = None
+    try:
+        os.unlink(temp_path)
+    except Exception as e:
+        cleanup_warning = f"Note: Could not remove temporary file ({str(e)}). This won't affect your data import."
+    
+    return stats, cleanup_warning
+
+
 def render_file_upload(process_callback: Callable[[str, int, int, bool], Dict[str, Any]], 
                       campaign_id: int, scrape_type_id: int):
     """
@@ -119,20 +165,13 @@ def render_file_upload(process_callback: Callable[[str, int, int, bool], Dict[st
         # Process button
         if st.button("Process File"):
             with st.spinner('Processing file...'):
-                # Save uploaded file to a temporary file
-                with tempfile.NamedTemporaryFile(delete=False, suffix='.xlsx') as tmp_file:
-                    tmp_file.write(uploaded_file.getbuffer())
-                    temp_path = tmp_file.name
-                
                 try:
-                    # Process the file - passing force_upload parameter
-                    stats = process_callback(temp_path, campaign_id, scrape_type_id, force_upload)
+                    stats, cleanup_warning = _process_upload(
+                        uploaded_file, process_callback, campaign_id, scrape_type_id, force_upload
+                    )
                     
-                    # Clean up temp file
-                    try:
-                        os.unlink(temp_path)
-                    except Exception as e:
-                        st.warning(f"Note: Could not remove temporary file ({str(e)}). This won't affect your data import.")
+                    if cleanup_warning:
+                        st.warning(cleanup_warning)
                     
                     # Display results
                     st.success("File processed successfully!")
@@ -149,12 +188,6 @@ def render_file_upload(process_callback: Callable[[str, int, int, bool], Dict[st
                 
                 except Exception as e:
                     st.error(f"Error processing file: {e}")
-                    # Clean up temp file
-                    try:
-                        if os.path.exists(temp_path):
-                            os.unlink(temp_path)
-                    except Exception:
-                        pass
 
 
 def render_footer():
@@ -1,13 +1,57 @@
 import pandas as pd
 import numpy as np
+import os
 import uuid
 import logging
 import re
 from datetime import datetime
-from typing import Optional, Any, Dict, List, Union
+from typing import Optional, Any, Dict, List, NamedTuple, Union
 
 logger = logging.getLogger(__name__)
 
+# Trailing milliseconds of an ISO timestamp, e.g. ".123Z"
+_ISO_MS_RE = re.compile(r'\.\d+Z$')
+# Numeric part of a price string
+_PRICE_NUM_RE = re.compile(r'(\d+\.?\d*)')
+# Currency symbols and thousands separators stripped from prices, in one pass
+_STRIP_TABLE = str.maketrans('', '', '$£€,')
+# Lowercased strings read as True / False
+_TRUE_TOKENS = frozenset(('true', 't', 'yes', 'y', '1', '1.0'))
+_FALSE_TOKENS = frozenset(('false', 'f', 'no', 'n', '0', '0.0'))
+# Sheet columns read by the transforms: the shopping grid's per-product columns,
+# and the row date, query and product scraper fields
+_GRID_PRODUCT_COL_RE = re.compile(r'Product\d+_(Title|Link|Price|Merchant)')
+_USED_COLUMNS = frozenset((
+    'Date', 'Query', 'id', 'title', 'link', 'position', 'rating', 'reviews', 'price',
+    'price_raw', 'merchant', 'is_carousel', 'carousel_position', 'has_product_page',
+))
+# Title column of a shopping grid product, capturing the product number
+_GRID_TITLE_COL_RE = re.compile(r'Product(\d+)_Title')
+# Text columns (besides the ProductN_* ones), read as pandas' nullable string
+# dtype to skip type inference (and so numbers in them, e.g. ids, aren't read as floats)
+_STRING_COLUMNS = frozenset(('Query', 'id', 'title', 'link', 'price_raw', 'merchant', 'carousel_position'))
+
+class ScrapeRecord(NamedTuple):
+    """A scrape_data row filled from the Excel data, with fields in COPY column order."""
+    campaign_id: int
+    scrape_type_id: int
+    scrape_date: str
+    keyword: str
+    position: Optional[int] = None
+    product_id: Optional[str] = None
+    title: Optional[str] = None
+    link: Optional[str] = None
+    rating: Optional[float] = None
+    reviews: Optional[int] = None
+    price: Optional[float] = None
+    price_raw: Optional[str] = None
+    merchant: Optional[str] = None
+    is_carousel: Optional[bool] = None
+    carousel_position: Optional[str] = None
+    filters: Optional[str] = None
+    has_product_page: Optional[bool] = None
+
+
 def parse_date(date_value: Any) -> Optional[datetime]:
     """
     Parse a date value from various formats into a datetime object.
@@ -29,7 +73,7 @@ def parse_date(date_value: Any) -> Optional[datetime]:
         # If string, try various formats
         if isinstance(date_value, str):
             # Remove the Z and milliseconds if present
-            date_value = re.sub(r'\.\d+Z$', 'Z', date_value)
+            date_value = _ISO_MS_RE.sub('Z', date_value)
             # Parse ISO format
             try:
                 return datetime.fromisoformat(date_value.replace('Z', '+00:00'))
@@ -67,11 +111,11 @@ def clean_price(price_value: Any) -> Optional[float]:
         # If string, extract numeric part
         if isinstance(price_value, str):
             # Remove currency symbols and commas
-            price_str = price_value.replace('$', '').replace('£', '').replace('€', '').replace(',', '')
+            price_str = price_value.translate(_STRIP_TABLE)
             # Extract numeric part
-            matches = re.findall(r'\d+\.?\d*', price_str)
-            if matches:
-                return float(matches[0])
+            match = _PRICE_NUM_RE.search(price_str)
+            if match:
+                return float(match.group())
     except Exception as e:
         logger.warning(f"Failed to parse price {price_value}: {e}")
         
@@ -101,249 +145,383 @@ def clean_to_bool(value: Any) -> Optional[bool]:
         
     # If string
     if isinstance(value, str):
-        value = value.lower().strip()
-        if value in ('true', 't', 'yes', 'y', '1', '1.0'):
+        value = value.strip().lower()
+        if value in _TRUE_TOKENS:
             return True
-        if value in ('false', 'f', 'no', 'n', '0', '0.0'):
+        if value in _FALSE_TOKENS:
             return False
             
     return None
 
 
-def transform_shopping_grid_data(df, keyword, scrape_date, campaign_id, scrape_type_id):
+def _uuid4_strings(count: int) -> List[str]:
+    """
+    Generate random (version 4) UUID strings from a single os.urandom call.
+    
+    Args:
+        count: Number of UUIDs to generate
+        
+    Returns:
+        List of UUID strings, formatted like str(uuid.uuid4())
+    """
+    random_bytes = os.urandom(16 * count)
+    return [str(uuid.UUID(bytes=random_bytes[i:i + 16], version=4)) for i in range(0, 16 * count, 16)]
+
+
+def fill_generated_fields(records: List[ScrapeRecord], scrape_date: datetime) -> List[ScrapeRecord]:
+    """
+    Fill in the fields left for the caller: a missing scrape date, and the
+    product IDs of shopping grid products transformed with generate_ids=False.
+    
+    Args:
+        records: Records, e.g. a batch about to be inserted
+        scrape_date: Date for records without one
+        
+    Returns:
+        Records with a scrape date and a product ID, newly generated where missing
+    """
+    missing_ids = sum(1 for record in records if record.product_id is None)
+    if not missing_ids and all(record.scrape_date is not None for record in records):
+        return records
+    
+    date_str = scrape_date.strftime('%Y-%m-%dT%H:%M:%S')
+    new_ids = iter(_uuid4_strings(missing_ids))
+    return [
+        record._replace(
+            scrape_date=date_str if record.scrape_date is None else record.scrape_date,
+            product_id=next(new_ids) if record.product_id is None else record.product_id,
+        )
+        for record in records
+    ]
+
+
+def is_used_column(column: Any) -> bool:
+    """
+    Check whether a sheet column is read by any of the transforms.
+    
+    Meant as the usecols filter of pd.read_excel, so unused columns are never loaded.
+    
+    Args:
+        column: Column name from the sheet header
+        
+    Returns:
+        True if the column should be read
+    """
+    if not isinstance(column, str):
+        return False
+    return column in _USED_COLUMNS or _GRID_PRODUCT_COL_RE.fullmatch(column) is not None
+
+
+def string_column_dtypes(columns) -> Dict[str, str]:
+    """
+    Get the read_excel dtypes of a sheet's text columns, from its header.
+    
+    Args:
+        columns: Column names from the sheet header
+        
+    Returns:
+        Mapping of each text column to pandas' 'string' dtype
+    """
+    return {
+        col: 'string'
+        for col in columns
+        if isinstance(col, str) and (col in _STRING_COLUMNS or _GRID_PRODUCT_COL_RE.fullmatch(col))
+    }
+
+
+def parse_date_column(dates: pd.Series) -> pd.Series:
+    """
+    Parse a column of sheet dates in one pass.
+    
+    Args:
+        dates: Column of dates (datetimes or ISO / day-first date strings)
+        
+    Returns:
+        Datetime Series, with NaT where a value could not be parsed.
+        Timestamps with a UTC offset are converted to UTC.
+    """
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return dates
+    
+    # pandas' fast ISO 8601 parser covers the common case; only the misses
+    # are tried as day-first dates
+    parsed = pd.to_datetime(dates, format='ISO8601', utc=True, errors='coerce').dt.tz_localize(None)
+    return parsed.fillna(pd.to_datetime(dates, format='%d/%m/%Y', errors='coerce'))
+
+
+def _row_dates(df: pd.DataFrame, scrape_date: Any) -> pd.Series:
+    """
+    Get the date of each row from its Date column, falling back to the scrape date.
+    
+    Args:
+        df: DataFrame with scraper data
+        scrape_date: Default date of the scrape (None leaves rows without a date NaT)
+        
+    Returns:
+        Series of timestamps aligned with df
+    """
+    default_date = pd.Timestamp(scrape_date)
+    if 'Date' not in df.columns:
+        return pd.Series(default_date, index=df.index)
+    
+    return parse_date_column(df['Date']).fillna(default_date)
+
+
+def _to_bool_series(values: pd.Series) -> pd.Series:
+    """
+    Convert a column to booleans: numbers by truthiness, strings by token.
+    
+    Args:
+        values: Column of bool-ish values
+        
+    Returns:
+        Boolean Series, with missing values left missing
+    """
+    numeric = pd.to_numeric(values, errors='coerce')
+    from_strings = values.astype(str).str.lower().isin(_TRUE_TOKENS)
+    return from_strings.where(numeric.isna(), numeric != 0).where(values.notna())
+
+
+def _to_scrape_records(records: pd.DataFrame):
+    """
+    Convert transformed columns to ScrapeRecord tuples.
+    
+    Args:
+        records: DataFrame with (some of) the ScrapeRecord fields as columns
+        
+    Yields:
+        ScrapeRecord tuples; missing fields and values become None, i.e. NULL in the database
+    """
+    records = records.reindex(columns=ScrapeRecord._fields).astype(object)
+    records = records.where(records.notna(), None)
+    yield from map(ScrapeRecord._make, records.itertuples(index=False, name=None))
+
+
+def _is_shopping_grid(columns) -> bool:
+    """
+    Check whether sheet columns are in the shopping grid format (Product1_Title, etc).
+    
+    Args:
+        columns: Column names of the sheet
+        
+    Returns:
+        True if any column is a product title or link
+    """
+    return any(
+        isinstance(col, str) and col.startswith('Product') and ('_Title' in col or '_Link' in col)
+        for col in columns
+    )
+
+
+def transform_shopping_grid_data(df, keyword, scrape_date, campaign_id, scrape_type_id, format_checked=False,
+                                 generate_ids=True):
     """
     Transform shopping grid data (Format 1 - with Product1_Title, etc).
     
     Args:
         df: DataFrame with shopping grid data
         keyword: The keyword (sheet name)
-        scrape_date: Default date of the scrape
+        scrape_date: Default date of the scrape, or None to leave the scrape date of
+            rows without one None
         campaign_id: ID of the campaign
         scrape_type_id: ID of the scrape type
+        format_checked: Whether the caller already detected the shopping grid format
+        generate_ids: Whether to generate the product IDs. If False they are left None,
+            to be filled with fill_generated_fields.
         
-    Returns:
-        List of dictionaries ready for database insertion
+    Yields:
+        ScrapeRecord tuples ready for database insertion
     """
     logger.info(f"Transforming shopping grid data for keyword: {keyword}")
     
+    col_set = set(df.columns)
+    
     # First, check if this is a shopping grid format
-    if not any(col.startswith('Product') and ('_Title' in col or '_Link' in col) for col in df.columns):
+    if not format_checked and not _is_shopping_grid(col_set):
         logger.warning(f"Sheet doesn't appear to be in shopping grid format. Columns: {df.columns.tolist()}")
-        return []  # Return empty list
+        return  # Yield nothing
     
-    # Initialize list to hold transformed records
-    transformed_records = []
+    # Product numbers present in this sheet, from its Product<i>_Title columns
+    product_indices = sorted({
+        int(match.group(1))
+        for col in col_set
+        if isinstance(col, str) and (match := _GRID_TITLE_COL_RE.fullmatch(col))
+    })
     
-    # Process each row (each row is a different query/date)
-    for idx, row in df.iterrows():
-        # Get the date and query for this row
-        row_date = row.get('Date', scrape_date)
-        if isinstance(row_date, str):
-            try:
-                row_date = datetime.strptime(row_date, '%Y-%m-%d')
-            except ValueError:
-                try:
-                    row_date = datetime.strptime(row_date, '%d/%m/%Y')
-                except ValueError:
-                    row_date = scrape_date
-        elif not isinstance(row_date, datetime):
-            row_date = scrape_date
-        
-        query = row.get('Query', keyword)
-        
-        # Process each product in the row
-        for i in range(1, 15):  # Up to 15 products to be safe
-            prefix = f"Product{i}_"
-            title_col = f"{prefix}Title"
-            link_col = f"{prefix}Link"
-            price_col = f"{prefix}Price"
-            merchant_col = f"{prefix}Merchant"
-            delivery_col = f"{prefix}Delivery"
-            
-            # Check if this product has basic required data
-            if (title_col in df.columns and link_col in df.columns and 
-                pd.notna(row.get(title_col)) and pd.notna(row.get(link_col))):
-                
-                # Generate a unique ID for this product
-                product_id = str(uuid.uuid4())
-                
-                # Position is based on product number
-                position = i
-                
-                # Create record
-                record = {
-                    "campaign_id": campaign_id,
-                    "scrape_type_id": scrape_type_id,
-                    "scrape_date": row_date.isoformat(),
-                    "keyword": query if query else keyword,
-                    "product_id": product_id,
-                    "title": str(row.get(title_col, "")),
-                    "link": str(row.get(link_col, "")),
-                    "position": position
-                }
-                
-                # Add optional fields if they exist
-                if price_col in df.columns and pd.notna(row.get(price_col)):
-                    # Process price - remove currency symbols, etc.
-                    price_str = str(row.get(price_col, ""))
-                    price_str = price_str.replace('$', '').replace('£', '').replace('€', '').replace(',', '')
-                    try:
-                        # Extract first number from string
-                        price_match = re.search(r'\d+\.?\d*', price_str)
-                        if price_match:
-                            record["price"] = float(price_match.group())
-                        record["price_raw"] = price_str
-                    except (ValueError, TypeError):
-                        record["price_raw"] = price_str
-                
-                if merchant_col in df.columns and pd.notna(row.get(merchant_col)):
-                    record["merchant"] = str(row.get(merchant_col, ""))
-                
-                transformed_records.append(record)
-    
-    logger.info(f"Transformed {len(transformed_records)} products for keyword: {keyword}")
-    return transformed_records
-
-
-def transform_product_scraper_data(df, keyword, scrape_date, campaign_id, scrape_type_id):
+    # Column names of each product with both a title and a link column
+    product_cols = [
+        (i, f"Product{i}_Title", f"Product{i}_Link", f"Product{i}_Price", f"Product{i}_Merchant")
+        for i in product_indices
+        if f"Product{i}_Link" in col_set
+    ]
+    
+    # Reshape to one row per product: each sheet row (a query/date) holds
+    # Product<i>_Title, Product<i>_Link, ... for each product
+    product_frames = []
+    for i, title_col, link_col, price_col, merchant_col in product_cols:
+        product = df.reindex(columns=[title_col, link_col, price_col, merchant_col])
+        product.columns = ['title', 'link', 'price', 'merchant']
+        # Position is based on product number
+        product['position'] = i
+        product_frames.append(product)
+    
+    if not product_frames:
+        logger.info(f"Transformed 0 products for keyword: {keyword}")
+        return
+    
+    # Back in sheet row order, keeping only products with basic required data
+    products = pd.concat(product_frames).sort_index(kind='stable')
+    products = products.loc[products['title'].notna() & products['link'].notna()]
+    
+    # Get the date and query for each product's row
+    row_dates = _row_dates(df, scrape_date).dt.strftime('%Y-%m-%dT%H:%M:%S')
+    if 'Query' in col_set:
+        queries = df['Query'].where(df['Query'].notna() & (df['Query'] != ''), keyword)
+    else:
+        queries = pd.Series(keyword, index=df.index)
+    
+    records = pd.DataFrame(index=products.index)
+    records['campaign_id'] = campaign_id
+    records['scrape_type_id'] = scrape_type_id
+    records['scrape_date'] = row_dates.loc[products.index].to_numpy()
+    records['keyword'] = queries.loc[products.index].to_numpy()
+    # Generate a unique ID for each product
+    if generate_ids:
+        records['product_id'] = _uuid4_strings(len(products))
+    records['title'] = products['title'].astype('string')
+    records['link'] = products['link'].astype('string')
+    records['position'] = products['position']
+    
+    # Process price - remove currency symbols, then take the first number
+    has_price = products['price'].notna()
+    price_raw = products['price'].astype('string').str.translate(_STRIP_TABLE)
+    records['price'] = price_raw.str.extract(_PRICE_NUM_RE)[0].astype(float).where(has_price)
+    records['price_raw'] = price_raw.where(has_price)
+    
+    records['merchant'] = products['merchant'].astype('string')
+    
+    logger.info(f"Transformed {len(records)} products for keyword: {keyword}")
+    
+    yield from _to_scrape_records(records)
+
+
+def transform_product_scraper_data(df, keyword, scrape_date, campaign_id, scrape_type_id, format_checked=False):
     """
     Transform product scraper data (Format 2 - with id, title, link columns).
     
     Args:
         df: DataFrame with product scraper data
         keyword: The keyword (sheet name)
-        scrape_date: Default date of the scrape
+        scrape_date: Default date of the scrape, or None to leave the scrape date of
+            rows without one None
         campaign_id: ID of the campaign
         scrape_type_id: ID of the scrape type
+        format_checked: Whether the caller already checked for the id and title columns
         
-    Returns:
-        List of dictionaries ready for database insertion
+    Yields:
+        ScrapeRecord tuples ready for database insertion
     """
     logger.info(f"Transforming product scraper data for keyword: {keyword}")
     
+    col_set = set(df.columns)
+    
     # More flexible check - just need to have some key columns
     key_columns = ['id', 'title']
-    if not all(col in df.columns for col in key_columns):
+    if not format_checked and not all(col in col_set for col in key_columns):
         logger.warning(f"Sheet doesn't have minimum required columns. Columns: {df.columns.tolist()}")
-        return []  # Return empty list
+        return  # Yield nothing
     
     # Log how many rows we're processing
     logger.info(f"Processing {len(df)} rows for keyword: {keyword}")
     
-    # Initialize list to hold transformed records
-    transformed_records = []
+    # Skip rows without basic required data
+    df = df.loc[df['id'].notna() & df['title'].notna()]
     
-    # Process each row
-    for idx, row in df.iterrows():
-        # Skip rows without basic required data
-        if pd.isna(row.get('id')) or pd.isna(row.get('title')):
-            continue
-        
-        # Get the date for this row
-        row_date = row.get('Date', scrape_date)
-        if isinstance(row_date, str):
-            try:
-                row_date = datetime.strptime(row_date, '%Y-%m-%d')
-            except ValueError:
-                try:
-                    row_date = datetime.strptime(row_date, '%d/%m/%Y')
-                except ValueError:
-                    row_date = scrape_date
-        elif not isinstance(row_date, datetime):
-            row_date = scrape_date
-        
-        # Create record with required fields
-        record = {
-            "campaign_id": campaign_id,
-            "scrape_type_id": scrape_type_id,
-            "scrape_date": row_date.isoformat(),
-            "keyword": keyword,
-            "product_id": str(row['id']),
-            "title": str(row['title']),
-        }
-        
-        # Add link if available, otherwise use a placeholder
-        if 'link' in df.columns and not pd.isna(row.get('link')):
-            record["link"] = str(row['link'])
-        else:
-            record["link"] = f"https://example.com/product/{record['product_id']}"
-        
-        # Add other optional fields if they exist
-        optional_fields = {
-            'position': 'position',
-            'rating': 'rating',
-            'reviews': 'reviews',
-            'price': 'price',
-            'price_raw': 'price_raw',
-            'merchant': 'merchant',
-            'is_carousel': 'is_carousel',
-            'carousel_position': 'carousel_position',
-            'has_product_page': 'has_product_page'
-        }
-        
-        for db_field, excel_field in optional_fields.items():
-            if excel_field in df.columns and not pd.isna(row.get(excel_field)):
-                # Special handling for certain fields
-                if db_field == 'position' and isinstance(row[excel_field], (int, float, str)):
-                    try:
-                        record[db_field] = int(float(row[excel_field]))
-                    except (ValueError, TypeError):
-                        pass
-                elif db_field in ['is_carousel', 'has_product_page']:
-                    value = row[excel_field]
-                    if isinstance(value, bool):
-                        record[db_field] = value
-                    elif isinstance(value, str):
-                        record[db_field] = value.lower() in ('true', 't', 'yes', 'y', '1')
-                    elif isinstance(value, (int, float)):
-                        record[db_field] = bool(value)
-                else:
-                    record[db_field] = row[excel_field]
-        
-        transformed_records.append(record)
+    # Build the records column by column
+    records = pd.DataFrame(index=df.index)
+    records['campaign_id'] = campaign_id
+    records['scrape_type_id'] = scrape_type_id
+    records['scrape_date'] = _row_dates(df, scrape_date).dt.strftime('%Y-%m-%dT%H:%M:%S')
+    records['keyword'] = keyword
+    records['product_id'] = df['id'].astype('string')
+    records['title'] = df['title'].astype('string')
+    
+    # Add link if available, otherwise use a placeholder
+    placeholder_links = 'https://example.com/product/' + records['product_id']
+    if 'link' in col_set:
+        records['link'] = df['link'].astype('string').fillna(placeholder_links)
+    else:
+        records['link'] = placeholder_links
+    
+    # Add other optional fields if they exist, with special handling for certain fields
+    if 'position' in col_set:
+        records['position'] = np.trunc(pd.to_numeric(df['position'], errors='coerce')).astype('Int64')
     
-    logger.info(f"Transformed {len(transformed_records)} products for keyword: {keyword}")
-    return transformed_records
+    for field in ('is_carousel', 'has_product_page'):
+        if field in col_set:
+            records[field] = _to_bool_series(df[field])
+    
+    # Whole numbers, as COPY won't cast "10.0" to an integer column like an INSERT would
+    if 'reviews' in col_set:
+        records['reviews'] = pd.to_numeric(df['reviews'], errors='coerce').round().astype('Int32')
+    
+    for field in ('rating', 'price', 'price_raw', 'merchant', 'carousel_position'):
+        if field in col_set:
+            records[field] = df[field]
+    
+    logger.info(f"Transformed {len(records)} products for keyword: {keyword}")
+    
+    yield from _to_scrape_records(records)
 
-def detect_and_transform_data(df, keyword, scrape_date, campaign_id, scrape_type_id):
+def detect_and_transform_data(df, keyword, scrape_date, campaign_id, scrape_type_id, sheet_columns=None,
+                              generate_ids=True):
     """
     Detect the type of data format and transform accordingly.
     
     Args:
         df: DataFrame with scraper data
         keyword: The keyword (sheet name)
-        scrape_date: Default date of the scrape
+        scrape_date: Default date of the scrape, or None to leave the scrape date of
+            rows without one None
         campaign_id: ID of the campaign
         scrape_type_id: ID of the scrape type
+        sheet_columns: All column names of the sheet, for logging when df
+            was read with only some of them (defaults to df's columns)
+        generate_ids: Whether to generate product IDs for shopping grid products
+            (see transform_shopping_grid_data)
         
-    Returns:
-        List of dictionaries ready for database insertion
+    Yields:
+        ScrapeRecord tuples ready for database insertion
     """
-    logger.info(f"Detecting data format for sheet {keyword}. Columns: {df.columns.tolist()}")
+    if sheet_columns is None:
+        sheet_columns = df.columns.tolist()
+    logger.info(f"Detecting data format for sheet {keyword}. Columns: {sheet_columns}")
+    
+    # Detect each format once; the chosen transform skips its own check
+    col_set = set(df.columns)
     
     # Detect Shopping Grid format (Product1_Title, etc.)
-    if any(col.startswith('Product') and ('_Title' in col or '_Link' in col) for col in df.columns):
-        return transform_shopping_grid_data(df, keyword, scrape_date, campaign_id, scrape_type_id)
+    if _is_shopping_grid(col_set):
+        yield from transform_shopping_grid_data(df, keyword, scrape_date, campaign_id, scrape_type_id, format_checked=True,
+                                                generate_ids=generate_ids)
+        return
     
     # Case 1: Standard Product Scraper format
-    if all(col in df.columns for col in ['id', 'title', 'link']):
-        return transform_product_scraper_data(df, keyword, scrape_date, campaign_id, scrape_type_id)
+    if all(col in col_set for col in ['id', 'title', 'link']):
+        yield from transform_product_scraper_data(df, keyword, scrape_date, campaign_id, scrape_type_id, format_checked=True)
+        return
     
     # Case 2: Product Scraper format with position as first column
-    if all(col in df.columns for col in ['position', 'title', 'id']) and 'link' not in df.columns:
+    if all(col in col_set for col in ['position', 'title', 'id']) and 'link' not in col_set:
         # This is still the product format, but we need to be careful
         # It's missing the 'link' column which is required in our database
         logger.warning(f"Sheet {keyword} has position but is missing link column. Generating placeholder links.")
         
-        # Create a copy with a generated link column
-        df_with_link = df.copy()
-        df_with_link['link'] = df_with_link.apply(
-            lambda row: f"https://example.com/product/{row['id']}" if 'id' in row else "", 
-            axis=1
-        )
+        # Add a generated link column (a new frame that shares the other columns)
+        df_with_link = df.assign(link='https://example.com/product/' + df['id'].astype('string'))
         
-        return transform_product_scraper_data(df_with_link, keyword, scrape_date, campaign_id, scrape_type_id)
+        yield from transform_product_scraper_data(df_with_link, keyword, scrape_date, campaign_id, scrape_type_id, format_checked=True)
+        return
     
     # Could not determine format
-    logger.warning(f"Could not determine data format for sheet {keyword}. Columns: {df.columns.tolist()}")
-    return []
\ No newline at end of file
+    logger.warning(f"Could not determine data format for sheet {keyword}. Columns: {sheet_columns}")
\ No newline at end of file